@@ -1,14 +1,29 @@
 import os
+import re
+import gzip
 import math
+import time
+import logging
 import sqlite3
+import struct
+import zlib
+import contextvars
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Tuple, Optional
+from urllib.parse import parse_qsl
 
-from flask import Flask, render_template, request, send_file, redirect, url_for, g, flash, Response
+import click
+import numpy as np
+from flask import (
+    Flask, render_template, request, send_file, redirect, url_for, g, flash, Response, jsonify, stream_with_context,
+)
 
 
 # ------------ App setup ------------
 
+logger = logging.getLogger(__name__)
+
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DB_PATH = os.path.join(BASE_DIR, "data", "cuffs.db")
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
@@ -78,6 +93,26 @@ def create_app() -> Flask:
             return redirect(url_for("history"))
         return send_file(filepath, as_attachment=True, download_name=row["filename"])
 
+    @app.route("/thumbnail/<int:cfg_id>.png")
+    def thumbnail(cfg_id: int):
+        # PNG preview cached beside the STL; rendered on first view, off the /generate path
+        row = get_config(g.db, cfg_id)
+        if not row:
+            return Response("Configuration not found.", status=404, mimetype="text/plain")
+        thumb_path = thumbnail_path_for(row["filename"])
+        if not os.path.exists(thumb_path):
+            stl_path = os.path.join(OUTPUT_DIR, row["filename"])
+            if not os.path.exists(stl_path):
+                return Response("Generated file missing on disk.", status=404, mimetype="text/plain")
+            try:
+                tris = load_stl_triangles(stl_path)
+            except Exception:
+                # Unreadable STL: cache a blank thumbnail rather than failing on every view
+                logger.warning("cannot read %s for its thumbnail", stl_path, exc_info=True)
+                tris = []
+            write_thumbnail(tris, thumb_path)
+        return send_file(thumb_path, mimetype="image/png", max_age=86400)
+
     @app.route("/stl")
     def stl_inline():
         # Return ASCII STL for in-browser preview (reduced resolution when preview=1)
@@ -85,9 +120,17 @@ def create_app() -> Flask:
         preview = request.args.get("preview", "1") == "1"
         params = parse_params(request.args, part)
         if preview:
-            # Cap resolution for fast rendering
-            params["grid_u"] = max(6, min(params["grid_u"], 40))
-            params["grid_v"] = max(6, min(params["grid_v"], 60))
+            cap_preview_resolution(params)
+        # Serve a precomputed payload (see warm-cache) when one exists
+        key = None if has_external_part_mesh(part) else part_mesh_cache_key(part, params)
+        gz = payload_cache_get(key) if key else None
+        if gz is not None:
+            if "gzip" in request.headers.get("Accept-Encoding", ""):
+                resp = Response(gz, mimetype="text/plain")
+                resp.headers["Content-Encoding"] = "gzip"
+                resp.headers["Vary"] = "Accept-Encoding"
+                return resp
+            return Response(gzip.decompress(gz), mimetype="text/plain")
         tris = generate_mesh_for_part(part, **params)
         stl = triangles_to_stl_bytes(tris, name=f"preview_{part}")
         return Response(stl, mimetype="text/plain")
@@ -97,34 +140,40 @@ def create_app() -> Flask:
         # Combined preview of all parts together (reduced resolution when preview=1)
         preview = request.args.get("preview", "1") == "1"
         hand = request.args.get("hand", "right")
-        cuff_params = parse_params_prefixed(request.args, part="cuff", prefix="cuff.")
-        finger_params = parse_params_prefixed(request.args, part="finger", prefix="finger.")
-        palm_params = parse_params_prefixed(request.args, part="palm", prefix="palm.")
-        gauntlet_params = parse_params_prefixed(request.args, part="gauntlet", prefix="gauntlet.")
-        pins_params = parse_params_prefixed(request.args, part="pins", prefix="pins.")
-        tensioner_params = parse_params_prefixed(request.args, part="three_pin_tensioner", prefix="three_pin_tensioner.")
-        prox_finger_params = parse_params_prefixed(request.args, part="proximal_finger", prefix="proximal_finger.")
-        prox_thumb_params = parse_params_prefixed(request.args, part="proximal_thumb", prefix="proximal_thumb.")
-        fingertip_params = parse_params_prefixed(request.args, part="finger_tip", prefix="finger_tip.")
+        assembly = parse_assembly_params(request.args)
         if preview:
-            for p in (cuff_params, finger_params):
-                p["grid_u"] = max(6, min(p["grid_u"], 40))
-                p["grid_v"] = max(6, min(p["grid_v"], 60))
-        tris = generate_combined_mesh(
-            cuff_params,
-            finger_params,
-            palm_params,
-            gauntlet_params,
-            pins_params,
-            tensioner_params,
-            prox_finger_params,
-            prox_thumb_params,
-            fingertip_params,
-            hand=hand,
-        )
+            for p in assembly[:2]:  # cuff and finger
+                cap_preview_resolution(p)
+        tris = generate_combined_mesh(*assembly, hand=hand)
         stl = triangles_to_stl_bytes(tris, name="preview_all")
         return Response(stl, mimetype="text/plain")
 
+    @app.route("/preview/update", methods=["POST"])
+    def preview_update():
+        # Latest parameters for a live-preview session (same query as /stl or /stl_all, plus target=all)
+        sid = request.args.get("sid", "")
+        if not PREVIEW_SID_RE.match(sid):
+            return Response("Invalid preview session id.", status=400, mimetype="text/plain")
+        query = request.get_data(as_text=True)
+        if len(query) > PREVIEW_MAX_QUERY:
+            return Response("Preview parameters too large.", status=413, mimetype="text/plain")
+        return jsonify(seq=update_preview_session(g.db, sid, query))
+
+    @app.route("/preview/stream")
+    def preview_stream():
+        # Server-Sent Events: coarse then full ASCII STL for the latest update of a session
+        sid = request.args.get("sid", "")
+        if not PREVIEW_SID_RE.match(sid):
+            return Response("Invalid preview session id.", status=400, mimetype="text/plain")
+        try:
+            last_seq = int(request.headers.get("Last-Event-ID", "0"))
+        except ValueError:
+            last_seq = 0
+        resp = Response(stream_with_context(preview_events(sid, last_seq)), mimetype="text/event-stream")
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.headers["X-Accel-Buffering"] = "no"  # stop nginx from buffering the stream
+        return resp
+
     @app.route("/export_step")
     def export_step():
         # Export STEP of selected part, or all together if all=1
@@ -132,32 +181,12 @@ def create_app() -> Flask:
         hand = request.args.get("hand", "right")
         timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
         if is_all:
-            cuff_params = parse_params_prefixed(request.args, part="cuff", prefix="cuff.")
-            finger_params = parse_params_prefixed(request.args, part="finger", prefix="finger.")
-            palm_params = parse_params_prefixed(request.args, part="palm", prefix="palm.")
-            gauntlet_params = parse_params_prefixed(request.args, part="gauntlet", prefix="gauntlet.")
-            pins_params = parse_params_prefixed(request.args, part="pins", prefix="pins.")
-            tensioner_params = parse_params_prefixed(request.args, part="three_pin_tensioner", prefix="three_pin_tensioner.")
-            prox_finger_params = parse_params_prefixed(request.args, part="proximal_finger", prefix="proximal_finger.")
-            prox_thumb_params = parse_params_prefixed(request.args, part="proximal_thumb", prefix="proximal_thumb.")
-            fingertip_params = parse_params_prefixed(request.args, part="finger_tip", prefix="finger_tip.")
-            tris = generate_combined_mesh(
-                cuff_params,
-                finger_params,
-                palm_params,
-                gauntlet_params,
-                pins_params,
-                tensioner_params,
-                prox_finger_params,
-                prox_thumb_params,
-                fingertip_params,
-                hand=hand,
-            )
+            tris = generate_combined_mesh(*parse_assembly_params(request.args), hand=hand)
             filename = f"prosthetic_all_{timestamp}.step"
         else:
             part = request.args.get("part", "cuff")
             params = parse_params(request.args, part)
-            tris = generate_mesh_for_part(part, **params)
+            tris = generate_mesh_array_for_part(part, **params)
             filename = f"{part}_{timestamp}.step"
 
         filepath = os.path.join(OUTPUT_DIR, filename)
@@ -167,6 +196,106 @@ def create_app() -> Flask:
             return Response(str(e), status=501, mimetype="text/plain")
         return send_file(filepath, as_attachment=True, download_name=filename)
 
+    @app.route("/export_3mf")
+    def export_3mf():
+        # Indexed 3MF of selected part, or the assembly with one object per part
+        # and a build item per placement when all=1
+        is_all = request.args.get("all") == "1"
+        hand = request.args.get("hand", "right")
+        timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        if is_all:
+            objects = generate_combined_parts(*parse_assembly_params(request.args), hand=hand, as_arrays=True)
+            filename = f"prosthetic_all_{timestamp}.3mf"
+        else:
+            part = request.args.get("part", "cuff")
+            params = parse_params(request.args, part)
+            objects = [(part, generate_mesh_array_for_part(part, **params), [IDENTITY_PLACEMENT])]
+            filename = f"{part}_{timestamp}.3mf"
+
+        filepath = os.path.join(OUTPUT_DIR, filename)
+        write_3mf(objects, filepath)
+        return send_file(filepath, as_attachment=True, download_name=filename)
+
+    @app.route("/export_ply")
+    def export_ply():
+        # Indexed binary PLY of selected part, or all together if all=1
+        is_all = request.args.get("all") == "1"
+        hand = request.args.get("hand", "right")
+        timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        if is_all:
+            tris = generate_combined_mesh(*parse_assembly_params(request.args), hand=hand)
+            filename = f"prosthetic_all_{timestamp}.ply"
+        else:
+            part = request.args.get("part", "cuff")
+            params = parse_params(request.args, part)
+            tris = generate_mesh_array_for_part(part, **params)
+            filename = f"{part}_{timestamp}.ply"
+
+        filepath = os.path.join(OUTPUT_DIR, filename)
+        write_ply(tris, filepath)
+        return send_file(filepath, as_attachment=True, download_name=filename)
+
+    @app.route("/scad/render", methods=["POST"])
+    def render_scad():
+        # Server-side OpenSCAD render of a models/ entry point, cached by sources + params.
+        # JSON body: {"entry": "fingerator.scad", "assignments": {...}} or {"entry", "parameter_set"}
+        from scad_render import get_renderer, ScadRenderError, ScadTimeoutError
+
+        body = request.get_json(silent=True) or {}
+        entry = str(body.get("entry", ""))
+        renderer = get_renderer()
+        try:
+            if body.get("parameter_set"):
+                assignments = renderer.parameter_set(entry, str(body["parameter_set"]))
+            else:
+                assignments = body.get("assignments") or {}
+                if not isinstance(assignments, dict):
+                    raise ValueError("assignments must be an object")
+            stl, hit = renderer.render(entry, assignments)
+        except ValueError as e:
+            return Response(str(e), status=400, mimetype="text/plain")
+        except ScadTimeoutError as e:
+            return Response(str(e), status=504, mimetype="text/plain")
+        except ScadRenderError as e:
+            return Response(str(e), status=422, mimetype="text/plain")
+        except RuntimeError as e:
+            return Response(str(e), status=501, mimetype="text/plain")
+        resp = Response(stl, mimetype="model/stl")
+        resp.headers["X-Scad-Cache"] = "hit" if hit else "miss"
+        return resp
+
+    @app.cli.command("scad-precompute")
+    def scad_precompute_command():
+        """Render every models/*.json parameterSet into the OpenSCAD cache."""
+        from scad_render import get_renderer
+
+        def progress(done, total, entry, set_name, err):
+            status = f"FAILED: {err}" if err else "ok"
+            click.echo(f"scad-precompute: [{done}/{total}] {entry} / {set_name}: {status}")
+
+        results = get_renderer().precompute_parameter_sets(progress=progress)
+        if any(err for _entry, _name, err in results):
+            raise SystemExit(1)
+
+    @app.cli.command("mesh-report")
+    def mesh_report_command():
+        """Weld each part at default params and print repair statistics."""
+        for part in ASSEMBLY_PARTS:
+            params = parse_params(default_params(part), part)
+            _verts, _faces, report = weld_mesh(generate_mesh_array_for_part(part, **params))
+            source = "asset" if has_external_part_mesh(part) else "generated"
+            click.echo(f"{part} ({source}): " + ", ".join(f"{k}={report[k]}" for k in WELD_REPORT_FIELDS))
+
+    @app.cli.command("warm-cache")
+    @click.option("--grid", "grid_path", type=click.Path(dir_okay=False), default=None,
+                  help="Grid JSON (default: data/warm_grid.json, else the built-in grid).")
+    @click.option("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    @click.option("--no-resume", is_flag=True, help="Regenerate entries that are already cached.")
+    def warm_cache_command(grid_path, workers, no_resume):
+        """Precompute meshes and /stl payloads for a parameter grid."""
+        grid = load_warm_grid(grid_path)
+        warm_mesh_cache(grid, workers=workers, resume=not no_resume)
+
     return app
 
 
@@ -202,6 +331,17 @@ def ensure_schema(conn: sqlite3.Connection):
     cols = {row[1] for row in conn.execute("PRAGMA table_info(configs)")}
     if "part" not in cols:
         conn.execute("ALTER TABLE configs ADD COLUMN part TEXT DEFAULT 'cuff'")
+    # Latest live-preview parameters per browser session (see preview_events)
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS preview_sessions (
+            sid TEXT PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            query TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
     conn.commit()
 
 
@@ -346,7 +486,9 @@ def parse_params(form, part: str = "cuff") -> dict:
         hole_every_n=max(0, min(50, f("hole_every_n", int, 5))),
         hole_size_cells=max(0, min(10, f("hole_size_cells", int, 2))),
         taper_ratio=max(0.0, min(0.9, f("taper_ratio", float, defaults.get("taper_ratio", 0.0)))),
-        scale=max(0.2, min(3.0, f("scale", float, defaults.get("scale", 1.0))))
+        scale=max(0.2, min(3.0, f("scale", float, defaults.get("scale", 1.0)))),
+        tessellation="adaptive" if form.get("tessellation", defaults.get("tessellation")) == "adaptive" else "uniform",
+        chord_tol_mm=max(0.01, min(2.0, f("chord_tol_mm", float, defaults.get("chord_tol_mm", 0.05)))),
     )
     return params
 
@@ -360,6 +502,34 @@ def parse_params_prefixed(form, part: str, prefix: str) -> dict:
     return parse_params(Pref(), part)
 
 
+ASSEMBLY_PARTS = (
+    "cuff",
+    "finger",
+    "palm",
+    "gauntlet",
+    "pins",
+    "three_pin_tensioner",
+    "proximal_finger",
+    "proximal_thumb",
+    "finger_tip",
+)
+
+# Parts generated as perforated shells by generate_cuff_mesh
+SHELL_PARTS = ("cuff", "finger", "gauntlet", "proximal_finger", "proximal_thumb")
+
+
+def parse_assembly_params(form) -> List[dict]:
+    # Per-part params for the assembly, in generate_combined_mesh argument order
+    return [parse_params_prefixed(form, part=p, prefix=p + ".") for p in ASSEMBLY_PARTS]
+
+
+def cap_preview_resolution(params: dict) -> dict:
+    # Cap resolution for fast in-browser rendering
+    params["grid_u"] = max(6, min(params["grid_u"], 40))
+    params["grid_v"] = max(6, min(params["grid_v"], 60))
+    return params
+
+
 # ------------ Geometry + STL ------------
 
 Vec3 = Tuple[float, float, float]
@@ -377,48 +547,66 @@ def generate_cuff_mesh(
     hole_every_n: int,
     hole_size_cells: int,
     taper_ratio: float = 0.0,
+    tessellation: str = "uniform",
+    chord_tol_mm: float = 0.05,
 ) -> List[Tri]:
     """
     Generate a cylindrical cuff with optional rectangular perforations.
     Returns a list of triangles (each triangle is 3 tuples of floats).
+
+    grid_u x grid_v always defines the perforation pattern. With
+    tessellation="adaptive" the mesh keeps only the rows along u where the
+    hole pattern changes (plus both ends; the surface is ruled, so rows in
+    between add nothing), and spaces columns along v by `chord_tol_mm`
+    instead of the cell count.
     """
     R = inner_radius_mm
     T = thickness_mm
     L = length_mm
     arc_rad = math.radians(arc_deg)
 
-    # Create parametric grids for inner (R) and outer (R+T) surfaces
-    U = grid_u
-    V = grid_v
-
-    def point(u_idx: int, v_idx: int, radius: float) -> Vec3:
-        u = u_idx / (U - 1)
-        v = v_idx / (V - 1)
-        ang = (v - 0.5) * arc_rad
-        r_here = radius * (1.0 - taper_ratio * u)
-        x = r_here * math.cos(ang)
-        y = r_here * math.sin(ang)
-        z = u * L
-        return (x, y, z)
-
-    inner = [[point(i, j, R) for j in range(V)] for i in range(U)]
-    outer = [[point(i, j, R + T) for j in range(V)] for i in range(U)]
+    # Nominal parametric grid for inner (R) and outer (R+T) surfaces
+    U0 = grid_u
+    V0 = grid_v
 
     # Prepare hole mask: True means the cell (quad) is a hole (skip skins)
-    hole = [[False for _ in range(V - 1)] for _ in range(U - 1)]
+    hole = [[False for _ in range(V0 - 1)] for _ in range(U0 - 1)]
     if hole_every_n > 0 and hole_size_cells > 0:
         step = hole_every_n
         size = hole_size_cells
-        for i in range(0, U - 1, step):
-            for j in range(0, V - 1, step):
+        for i in range(0, U0 - 1, step):
+            for j in range(0, V0 - 1, step):
                 # Carve a size x size block starting offset by half to stagger
                 for di in range(size):
                     for dj in range(size):
                         ii = i + di
                         jj = j + dj
-                        if 0 <= ii < U - 1 and 0 <= jj < V - 1:
+                        if 0 <= ii < U0 - 1 and 0 <= jj < V0 - 1:
                             hole[ii][jj] = True
 
+    # Row / column positions in nominal grid units (fractional along v when adaptive)
+    if tessellation == "adaptive":
+        u_pos, v_pos = adaptive_grid_positions(hole, U0, V0, arc_rad, R + T, chord_tol_mm)
+        hole = [[hole[int(pu)][int(pv)] for pv in v_pos[:-1]] for pu in u_pos[:-1]]
+    else:
+        u_pos = list(range(U0))
+        v_pos = list(range(V0))
+    U = len(u_pos)
+    V = len(v_pos)
+
+    def point(u_idx: int, v_idx: int, radius: float) -> Vec3:
+        u = u_pos[u_idx] / (U0 - 1)
+        v = v_pos[v_idx] / (V0 - 1)
+        ang = (v - 0.5) * arc_rad
+        r_here = radius * (1.0 - taper_ratio * u)
+        x = r_here * math.cos(ang)
+        y = r_here * math.sin(ang)
+        z = u * L
+        return (x, y, z)
+
+    inner = [[point(i, j, R) for j in range(V)] for i in range(U)]
+    outer = [[point(i, j, R + T) for j in range(V)] for i in range(U)]
+
     tris: List[Tri] = []
 
     def add_quad(a: Vec3, b: Vec3, c: Vec3, d: Vec3, flip: bool = False):
@@ -432,6 +620,7 @@ def generate_cuff_mesh(
 
     # Skin surfaces (inner and outer), skipping holes
     for i in range(U - 1):
+        check_cancelled()
         for j in range(V - 1):
             if hole[i][j]:
                 continue
@@ -440,7 +629,7 @@ def generate_cuff_mesh(
             # Inner surface faces inward -> flip to ensure outward normals
             add_quad(a_in, b_in, c_in, d_in, flip=True)
             # Outer surface faces outward
-            add_quad(d_out, c_out, b_out, a_out, flip=False)
+            add_quad(a_out, b_out, c_out, d_out, flip=False)
 
     # Rims around holes: connect inner and outer along hole edges
     def add_wall(p0_in: Vec3, p1_in: Vec3, p1_out: Vec3, p0_out: Vec3):
@@ -451,23 +640,27 @@ def generate_cuff_mesh(
         for j in range(V - 1):
             if not hole[i][j]:
                 continue
-            # Four edges: u-, u+, v-, v+
-            # Edge along v between (i,j)-(i,j+1)
-            if j == 0 or not hole[i][j - 1]:
-                add_wall(inner[i][j], inner[i][j + 1], outer[i][j + 1], outer[i][j])
-            if j == V - 2 or not hole[i][j + 1]:
-                add_wall(inner[i + 1][j + 1], inner[i + 1][j], outer[i + 1][j], outer[i + 1][j + 1])
-            if i == 0 or not hole[i - 1][j]:
+            # Four edges: u-, u+, v-, v+. Only edges facing a solid cell get a
+            # rim; a hole touching the outline is a notch, left open there.
+            # Edge along v between (i,j)-(i,j+1), facing cell (i-1,j)
+            if i > 0 and not hole[i - 1][j]:
+                add_wall(inner[i][j + 1], inner[i][j], outer[i][j], outer[i][j + 1])
+            if i < U - 2 and not hole[i + 1][j]:
+                add_wall(inner[i + 1][j], inner[i + 1][j + 1], outer[i + 1][j + 1], outer[i + 1][j])
+            # Edge along u between (i,j)-(i+1,j), facing cell (i,j-1)
+            if j > 0 and not hole[i][j - 1]:
                 add_wall(inner[i][j], inner[i + 1][j], outer[i + 1][j], outer[i][j])
-            if i == U - 2 or not hole[i + 1][j]:
+            if j < V - 2 and not hole[i][j + 1]:
                 add_wall(inner[i + 1][j + 1], inner[i][j + 1], outer[i][j + 1], outer[i + 1][j + 1])
 
-    # Perimeter side walls along v = 0 and v = V-1 (open arc edges)
+    # Perimeter side walls along v = 0 and v = V-1 (open arc edges), skipping notches
     for i in range(U - 1):
         # v = 0 edge
-        add_wall(inner[i][0], inner[i + 1][0], outer[i + 1][0], outer[i][0])
+        if not hole[i][0]:
+            add_wall(inner[i + 1][0], inner[i][0], outer[i][0], outer[i + 1][0])
         # v = V-1 edge
-        add_wall(inner[i + 1][V - 1], inner[i][V - 1], outer[i][V - 1], outer[i + 1][V - 1])
+        if not hole[i][V - 2]:
+            add_wall(inner[i][V - 1], inner[i + 1][V - 1], outer[i + 1][V - 1], outer[i][V - 1])
 
     # End caps at u = 0 and u = U-1, but skip where holes exist to keep perforations through
     for j in range(V - 1):
@@ -479,18 +672,82 @@ def generate_cuff_mesh(
     return tris
 
 
-def generate_mesh_for_part(part: str, **params) -> List[Tri]:
+def adaptive_grid_positions(
+    hole: List[List[bool]],
+    grid_u: int,
+    grid_v: int,
+    arc_rad: float,
+    max_radius: float,
+    chord_tol_mm: float,
+) -> Tuple[List[float], List[float]]:
+    """
+    Row (u) and column (v) positions, in nominal grid units, for adaptive cuffs.
+    Rows and columns are kept wherever the hole mask changes, so every hole
+    rim lies on a full grid line and no T-junctions appear. Along u the shell
+    is straight even when tapered (radius is linear in u), so nothing else
+    is needed. Along v each span is split until the chord sag at the outer
+    radius is within chord_tol_mm.
+    """
+    rows = [0] + [
+        i for i in range(1, grid_u - 1)
+        if any(hole[i - 1][j] != hole[i][j] for j in range(grid_v - 1))
+    ] + [grid_u - 1]
+    cols = [0] + [
+        j for j in range(1, grid_v - 1)
+        if any(hole[i][j - 1] != hole[i][j] for i in range(grid_u - 1))
+    ] + [grid_v - 1]
+
+    # Max angle per segment with sagitta r * (1 - cos(d/2)) <= tol
+    tol = max(1e-4, min(chord_tol_mm, max_radius))
+    max_step = 2.0 * math.acos(1.0 - tol / max_radius)
+    cell_angle = arc_rad / (grid_v - 1)
+    v_pos: List[float] = []
+    for c0, c1 in zip(cols[:-1], cols[1:]):
+        n = max(1, math.ceil((c1 - c0) * cell_angle / max_step - 1e-9))
+        v_pos += [c0 + (c1 - c0) * k / n for k in range(n)]
+    v_pos.append(float(grid_v - 1))
+    return [float(r) for r in rows], v_pos
+
+
+def cached_part_mesh(part: str, params: dict) -> Optional[np.ndarray]:
+    # (n, 3, 3) array of an imported asset or a precomputed mesh, or None. At
+    # scale 1 this is the shared read-only memmap itself, not a copy.
     s = params.get("scale", 1.0)
     # Try external assets first (Thingiverse Phoenix Hand STLs)
-    ext = load_external_part_mesh(part)
+    ext = load_external_part_array(part)
     if ext is not None:
-        tris = ext
-        if s != 1.0:
-            tris = scale_tris(tris, s, s, s)
-        return tris
-    if part in ("cuff", "finger", "gauntlet", "proximal_finger", "proximal_thumb"):
+        return ext * s if s != 1.0 else ext
+    # Then meshes precomputed into the shared cache (see preload_shared_assets)
+    return mesh_cache_get(part_mesh_cache_key(part, params))
+
+
+def generate_mesh_for_part(part: str, **params) -> List[Tri]:
+    check_cancelled()
+    cached = cached_part_mesh(part, params)
+    if cached is not None:
+        return cached.tolist()
+    return generate_part_mesh_uncached(part, **params)
+
+
+def generate_mesh_array_for_part(part: str, **params) -> np.ndarray:
+    # generate_mesh_for_part for array consumers (weld_mesh and the exporters):
+    # cached meshes are used in place instead of being expanded into lists
+    check_cancelled()
+    cached = cached_part_mesh(part, params)
+    if cached is not None:
+        return cached
+    return np.asarray(generate_part_mesh_uncached(part, **params), dtype=np.float64).reshape(-1, 3, 3)
+
+
+def generate_part_mesh_uncached(part: str, **params) -> List[Tri]:
+    # Procedural geometry for a part, bypassing imported assets and the mesh cache
+    s = params.get("scale", 1.0)
+    if part in SHELL_PARTS:
         p = dict(params)
         p.pop("scale", None)
+        if "chord_tol_mm" in p:
+            # Tolerance applies to the final, scaled part
+            p["chord_tol_mm"] = p["chord_tol_mm"] / s
         tris = generate_cuff_mesh(**p)
         if s != 1.0:
             tris = scale_tris(tris, s, s, s)
@@ -537,7 +794,27 @@ def transform_tris(
     return out
 
 
-def generate_combined_mesh(
+Placement = Tuple[Vec3, float]  # (translate, rotate_deg_z); rotation applied first
+IDENTITY_PLACEMENT: Placement = ((0.0, 0.0, 0.0), 0.0)
+AssemblyPart = Tuple[str, List[Tri], List[Placement]]
+
+
+def compose_placements(first: Placement, then: Placement) -> Placement:
+    # Single placement equivalent to applying `first` and then `then`
+    (t0, rz0), (t1, rz1) = first, then
+    ang = math.radians(rz1)
+    ca, sa = math.cos(ang), math.sin(ang)
+    return (
+        (
+            ca * t0[0] - sa * t0[1] + t1[0],
+            sa * t0[0] + ca * t0[1] + t1[1],
+            t0[2] + t1[2],
+        ),
+        rz0 + rz1,
+    )
+
+
+def generate_combined_parts(
     cuff_params: dict,
     finger_params: dict,
     palm_params: dict,
@@ -548,95 +825,136 @@ def generate_combined_mesh(
     prox_thumb_params: dict,
     fingertip_params: dict,
     hand: str = "right",
-) -> List[Tri]:
-    out: List[Tri] = []
-
+    as_arrays: bool = False,
+) -> List[AssemblyPart]:
+    """
+    Build the assembly as one base mesh per part plus the placements where it
+    is instanced, so exporters can share geometry between copies.
+    With as_arrays=True base meshes are (n, 3, 3) arrays (cached ones mapped in
+    place) for the indexed exporters instead of triangle lists.
+    """
+    mesh = generate_mesh_array_for_part if as_arrays else generate_mesh_for_part
+    mirror = mirror_array if as_arrays else mirror_tris
     # Load optional placement overrides
     placements = load_layout_placements() or {}
 
-    # Helper to apply a placement dict
-    def place(name: str, tris: List[Tri]):
+    # Placements for a part: layout overrides (applied after `base`) or defaults
+    def place(name: str, default: List[Placement], base: Placement = IDENTITY_PLACEMENT) -> List[Placement]:
         pl = placements.get(name)
         if not pl:
-            return tris
+            return default
         if "copies" in pl and isinstance(pl["copies"], list):
-            acc: List[Tri] = []
-            for cp in pl["copies"]:
-                t = tuple(cp.get("translate", (0.0, 0.0, 0.0)))
-                rz = float(cp.get("rotate_deg_z", 0.0))
-                acc += transform_tris(tris, translate=t, rotate_deg_z=rz)
-            return acc
-        t = tuple(pl.get("translate", (0.0, 0.0, 0.0)))
-        rz = float(pl.get("rotate_deg_z", 0.0))
-        return transform_tris(tris, translate=t, rotate_deg_z=rz)
+            entries = pl["copies"]
+        else:
+            entries = [pl]
+        out: List[Placement] = []
+        for cp in entries:
+            t = tuple(cp.get("translate", (0.0, 0.0, 0.0)))
+            rz = float(cp.get("rotate_deg_z", 0.0))
+            out.append(compose_placements(base, (t, rz)))
+        return out
+
+    parts: List[AssemblyPart] = []
 
     # Base cuff and finger splint
-    cuff = generate_mesh_for_part("cuff", **cuff_params)
-    out += cuff
-    finger = generate_mesh_for_part("finger", **finger_params)
-    # default finger offset if no placement provided
-    finger_default = transform_tris(
-        finger,
-        translate=(
+    parts.append(("cuff", mesh("cuff", **cuff_params), [IDENTITY_PLACEMENT]))
+    # default finger offset; layout overrides are applied on top of it
+    finger_default: Placement = (
+        (
             cuff_params.get("inner_radius_mm", 38.0)
             + cuff_params.get("thickness_mm", 3.0)
             + 35.0,
             0.0,
             0.0,
         ),
+        0.0,
     )
-    out += place("finger", finger_default)
+    parts.append((
+        "finger",
+        mesh("finger", **finger_params),
+        place("finger", [finger_default], base=finger_default),
+    ))
 
     # Palm
-    palm = generate_mesh_for_part("palm", **palm_params)
-    out += place("palm", palm) if placements.get("palm") else transform_tris(palm, translate=(0.0, 0.0, 0.0))
+    parts.append(("palm", mesh("palm", **palm_params), place("palm", [IDENTITY_PLACEMENT])))
 
     # Gauntlet
-    gaunt = generate_mesh_for_part("gauntlet", **gauntlet_params)
-    out += place("gauntlet", gaunt) if placements.get("gauntlet") else transform_tris(gaunt, translate=(0.0, 0.0, -70.0))
+    parts.append((
+        "gauntlet",
+        mesh("gauntlet", **gauntlet_params),
+        place("gauntlet", [((0.0, 0.0, -70.0), 0.0)]),
+    ))
 
     # Proximal fingers (4)
-    pf = generate_mesh_for_part("proximal_finger", **prox_finger_params)
-    if placements.get("proximal_finger"):
-        out += place("proximal_finger", pf)
-    else:
-        for xo in (-22.0, -7.0, 7.0, 22.0):
-            out += transform_tris(pf, translate=(xo, 35.0, 10.0))
+    parts.append((
+        "proximal_finger",
+        mesh("proximal_finger", **prox_finger_params),
+        place("proximal_finger", [((xo, 35.0, 10.0), 0.0) for xo in (-22.0, -7.0, 7.0, 22.0)]),
+    ))
 
     # Proximal thumb
-    pthumb = generate_mesh_for_part("proximal_thumb", **prox_thumb_params)
-    if placements.get("proximal_thumb"):
-        out += place("proximal_thumb", pthumb)
-    else:
-        out += transform_tris(pthumb, translate=(-35.0, 15.0, 5.0), rotate_deg_z=-20.0)
+    parts.append((
+        "proximal_thumb",
+        mesh("proximal_thumb", **prox_thumb_params),
+        place("proximal_thumb", [((-35.0, 15.0, 5.0), -20.0)]),
+    ))
 
     # Finger tip
-    ftip = generate_mesh_for_part("finger_tip", **fingertip_params)
-    out += place("finger_tip", ftip) if placements.get("finger_tip") else transform_tris(ftip, translate=(22.0, 55.0, 12.0))
+    parts.append((
+        "finger_tip",
+        mesh("finger_tip", **fingertip_params),
+        place("finger_tip", [((22.0, 55.0, 12.0), 0.0)]),
+    ))
 
     # Pins and tensioner
-    pins = generate_mesh_for_part("pins", **pins_params)
-    out += place("pins", pins) if placements.get("pins") else transform_tris(pins, translate=(0.0, -35.0, 8.0))
-    tens = generate_mesh_for_part("three_pin_tensioner", **tensioner_params)
-    out += place("three_pin_tensioner", tens) if placements.get("three_pin_tensioner") else transform_tris(tens, translate=(0.0, -50.0, 8.0))
-
-    # Mirror for left hand if requested
+    parts.append(("pins", mesh("pins", **pins_params), place("pins", [((0.0, -35.0, 8.0), 0.0)])))
+    parts.append((
+        "three_pin_tensioner",
+        mesh("three_pin_tensioner", **tensioner_params),
+        place("three_pin_tensioner", [((0.0, -50.0, 8.0), 0.0)]),
+    ))
+
+    # Mirror for left hand if requested: mirror each base mesh across Y and
+    # conjugate its placements (M * Rz(a) * M == Rz(-a)) so instancing survives
     if (hand or "right").lower().startswith("l"):
-        out = mirror_tris(out, axis='y')
+        parts = [
+            (name, mirror(tris, axis='y'), [((t[0], -t[1], t[2]), -rz) for t, rz in pls])
+            for name, tris, pls in parts
+        ]
+    return parts
+
+
+def generate_combined_mesh(*part_params: dict, hand: str = "right") -> List[Tri]:
+    # Flattened assembly; takes the same arguments as generate_combined_parts
+    out: List[Tri] = []
+    for _name, tris, pls in generate_combined_parts(*part_params, hand=hand):
+        for t, rz in pls:
+            check_cancelled()
+            out += transform_tris(tris, translate=t, rotate_deg_z=rz)
     return out
 
 
+_layout_cache: Optional[tuple] = None  # (mtime_ns, placements); filled by preload or first use
+
+
 def load_layout_placements():
+    global _layout_cache
     cfg_path = os.path.join(BASE_DIR, 'data', 'phoenix_layout.json')
-    if not os.path.exists(cfg_path):
+    try:
+        mtime = os.stat(cfg_path).st_mtime_ns
+    except OSError:
         return None
+    if _layout_cache is not None and _layout_cache[0] == mtime:
+        return _layout_cache[1]
     try:
         import json
         with open(cfg_path, 'r') as f:
             cfg = json.load(f)
-            return cfg.get('placements', {})
+            placements = cfg.get('placements', {})
     except Exception:
         return None
+    _layout_cache = (mtime, placements)
+    return placements
 
 
 def triangles_to_stl_bytes(tris: List[Tri], name: str = "mesh") -> bytes:
@@ -717,6 +1035,539 @@ def generate_cylinder_mesh(radius: float, height: float, segments: int = 24) ->
     return tris
 
 
+# ------------ Live preview channel (SSE) ------------
+
+PREVIEW_DEBOUNCE_S = 0.15       # quiet time after the latest update before generating
+PREVIEW_POLL_S = 0.05           # session polling / cancellation check interval
+PREVIEW_IDLE_CLOSE_S = 20.0     # end a stream this long after its last update; the page reopens it on the next edit
+PREVIEW_SESSION_TTL_S = 3600.0
+PREVIEW_MAX_QUERY = 16384
+PREVIEW_SID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+class GenerationCancelled(Exception):
+    """Raised at a checkpoint once a newer preview update superseded this one."""
+
+
+_cancel_check: contextvars.ContextVar = contextvars.ContextVar("cancel_check", default=None)
+
+
+def check_cancelled():
+    # Cooperative cancellation point; a no-op outside cancellation_scope()
+    check = _cancel_check.get()
+    if check is not None and check():
+        raise GenerationCancelled()
+
+
+@contextmanager
+def cancellation_scope(check):
+    token = _cancel_check.set(check)
+    try:
+        yield
+    finally:
+        _cancel_check.reset(token)
+
+
+def update_preview_session(conn: sqlite3.Connection, sid: str, query: str) -> int:
+    # Store the latest parameters for a session and return its new sequence number.
+    # Sessions live in SQLite so updates and the stream may hit different workers.
+    # Sequence numbers are clock-based (µs) so they keep increasing even when
+    # an idle session's row was purged and is inserted again.
+    now = time.time()
+    conn.execute(
+        """
+        INSERT INTO preview_sessions (sid, seq, query, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(sid) DO UPDATE SET
+            seq = MAX(seq + 1, excluded.seq), query = excluded.query, updated_at = excluded.updated_at
+        """,
+        (sid, time.time_ns() // 1000, query, now),
+    )
+    conn.execute("DELETE FROM preview_sessions WHERE updated_at < ?", (now - PREVIEW_SESSION_TTL_S,))
+    conn.commit()
+    return get_preview_session(conn, sid)["seq"]
+
+
+def get_preview_session(conn: sqlite3.Connection, sid: str):
+    cur = conn.execute("SELECT * FROM preview_sessions WHERE sid=?", (sid,))
+    return cur.fetchone()
+
+
+def superseded_check(conn: sqlite3.Connection, sid: str, seq: int):
+    # Cancellation check for generation of `seq`; reads the session at most every PREVIEW_POLL_S
+    state = dict(at=0.0, superseded=False)
+
+    def check() -> bool:
+        now = time.monotonic()
+        if not state["superseded"] and now - state["at"] >= PREVIEW_POLL_S:
+            state["at"] = now
+            row = get_preview_session(conn, sid)
+            state["superseded"] = row is None or row["seq"] != seq
+        return state["superseded"]
+
+    return check
+
+
+def coarse_preview_params(params: dict) -> dict:
+    # Solid adaptive envelope of a shell: the overall shape in a few dozen triangles
+    return dict(
+        params,
+        hole_every_n=0,
+        tessellation="adaptive",
+        chord_tol_mm=max(params.get("chord_tol_mm", 0.05), 1.0),
+    )
+
+
+def build_preview_mesh(args, coarse: bool = False) -> Optional[List[Tri]]:
+    """
+    Preview mesh for the parameters posted to /preview/update, matching /stl or
+    /stl_all (target=all) with preview=1. With coarse=True shells are replaced
+    by coarse_preview_params(); returns None when that would not differ.
+    """
+    if args.get("target") == "all":
+        assembly = parse_assembly_params(args)
+        for p in assembly[:2]:  # cuff and finger
+            cap_preview_resolution(p)
+        if coarse:
+            shells = [part in SHELL_PARTS and not has_external_part_mesh(part) for part in ASSEMBLY_PARTS]
+            if not any(shells):
+                return None
+            assembly = [coarse_preview_params(p) if s else p for p, s in zip(assembly, shells)]
+        return generate_combined_mesh(*assembly, hand=args.get("hand", "right"))
+    part = args.get("part", "cuff")
+    if coarse and (part not in SHELL_PARTS or has_external_part_mesh(part)):
+        return None
+    params = cap_preview_resolution(parse_params(args, part))
+    if coarse:
+        params = coarse_preview_params(params)
+    return generate_mesh_for_part(part, **params)
+
+
+def sse_event(event: str, data: str, event_id: Optional[int] = None) -> str:
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines += ["data: " + line for line in data.splitlines()]
+    return "\n".join(lines) + "\n\n"
+
+
+def preview_events(sid: str, last_seq: int = 0):
+    """
+    SSE stream for one preview session. Waits until updates have been quiet for
+    PREVIEW_DEBOUNCE_S, then sends a "coarse" event and a "full" event (id = seq)
+    with ASCII STL data. A newer update cancels the generation in progress at
+    the next check_cancelled() checkpoint, so only the latest state is finished.
+    Any seq other than the last one sent counts as new, so a stale Last-Event-ID
+    on reconnect is treated like no ID.
+
+    Each open stream holds a server thread and polls the session table, so it
+    ends with an "idle" event once no update has arrived for
+    PREVIEW_IDLE_CLOSE_S. The page then closes the EventSource instead of
+    letting it reconnect.
+    """
+    # Own connection: the request's g.db is closed before the stream is consumed
+    conn = get_db()
+    try:
+        last_active = time.time()
+        while True:
+            row = get_preview_session(conn, sid)
+            if row is None or row["seq"] == last_seq or time.time() - row["updated_at"] < PREVIEW_DEBOUNCE_S:
+                if row is not None:
+                    last_active = max(last_active, row["updated_at"])
+                if time.time() - last_active >= PREVIEW_IDLE_CLOSE_S:
+                    yield "event: idle\ndata: \n\n"
+                    return
+                time.sleep(PREVIEW_POLL_S)
+                continue
+            seq = last_seq = row["seq"]
+            args = dict(parse_qsl(row["query"]))
+            check = superseded_check(conn, sid, seq)
+            for level in ("coarse", "full"):
+                try:
+                    with cancellation_scope(check):
+                        tris = build_preview_mesh(args, coarse=(level == "coarse"))
+                        if tris is None:
+                            continue
+                        stl = triangles_to_stl_bytes(tris, name=f"preview_{level}").decode("ascii")
+                        check_cancelled()  # don't send a result that is already stale
+                except GenerationCancelled:
+                    logger.debug("preview %s: seq %d superseded during %s pass", sid, seq, level)
+                    break
+                last_active = time.time()
+                yield sse_event(level, stl, event_id=seq if level == "full" else None)
+    finally:
+        conn.close()
+
+
+# ------------ Vertex welding and mesh repair ------------
+
+# Vertices are snapped to a grid of this pitch and merged when they land in
+# the same cell; points closer than this but across a cell boundary stay apart
+WELD_TOLERANCE_MM = 1.0e-3
+WELD_REPORT_FIELDS = (
+    "input_faces",
+    "vertices",
+    "faces",
+    "merged_vertices",
+    "degenerate_faces",
+    "duplicate_faces",
+    "boundary_edges",
+    "non_manifold_edges",
+)
+
+
+def index_row_keys(rows: np.ndarray, n: int) -> np.ndarray:
+    # Pack rows of vertex indices (< n) into one int64 key each so np.unique
+    # sorts scalars; falls back to the rows themselves (use axis=0) if too wide
+    width = rows.shape[1]
+    if n ** width >= (1 << 63):
+        return rows
+    keys = np.zeros(len(rows), dtype=np.int64)
+    for j in range(width):
+        keys = keys * n + rows[:, j]
+    return keys
+
+
+def weld_triangles(tris, tol: float = WELD_TOLERANCE_MM) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    Weld a triangle soup into an indexed mesh and repair it.
+
+    Vertices are snapped to a `tol` grid and hashed into one integer key
+    each, so all coincident corners collapse in a single vectorized pass.
+    Faces that lose a corner (degenerate) are dropped. Of faces repeating the
+    same vertices with the same winding, one is kept; a face and its reverse
+    enclose nothing, so both are dropped (both counted as duplicate_faces).
+    Edges used once (boundary) or by more than two faces (non-manifold) are
+    counted in the report.
+    Returns (vertices float64 (n, 3), faces int64 (m, 3), report dict).
+    """
+    arr = np.asarray(tris, dtype=np.float64).reshape(-1, 3)
+    n_in = len(arr) // 3
+    if n_in == 0:
+        report = dict.fromkeys(WELD_REPORT_FIELDS, 0)
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64), report
+
+    q = np.round(arr / tol).astype(np.int64)
+    q -= q.min(axis=0)
+    if int(q.max()) < (1 << 21):
+        # Pack the three 21-bit cell coordinates into one int64 hash key
+        keys = (q[:, 0] << 42) | (q[:, 1] << 21) | q[:, 2]
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    else:
+        # Extent too large for packed keys at this tolerance; hash rows instead
+        _, first, inverse = np.unique(q, axis=0, return_index=True, return_inverse=True)
+    verts = arr[first]
+    faces = inverse.reshape(-1, 3).astype(np.int64)
+
+    degenerate = (faces[:, 0] == faces[:, 1]) | (faces[:, 1] == faces[:, 2]) | (faces[:, 2] == faces[:, 0])
+    faces = faces[~degenerate]
+    # Same-winding duplicates share their rotation starting at the lowest index
+    start = np.argmin(faces, axis=1)
+    rows = np.arange(len(faces))
+    rotated = np.stack([faces[rows, start], faces[rows, (start + 1) % 3], faces[rows, (start + 2) % 3]], axis=1)
+    _, keep = np.unique(index_row_keys(rotated, len(verts)), axis=0, return_index=True)
+    faces = faces[np.sort(keep)]
+    # Any vertex set still repeated now is a face plus its reverse
+    _, inverse, counts = np.unique(
+        index_row_keys(np.sort(faces, axis=1), len(verts)), axis=0, return_inverse=True, return_counts=True
+    )
+    faces = faces[counts[inverse.reshape(-1)] == 1]
+
+    # Drop vertices only referenced by removed faces
+    used, faces_flat = np.unique(faces, return_inverse=True)
+    faces = faces_flat.reshape(-1, 3).astype(np.int64)
+    verts = verts[used]
+
+    edges = np.sort(faces[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    _, edge_counts = np.unique(index_row_keys(edges, len(verts)), axis=0, return_counts=True)
+
+    report = dict(
+        input_faces=n_in,
+        vertices=len(verts),
+        faces=len(faces),
+        merged_vertices=len(arr) - len(first),
+        degenerate_faces=int(degenerate.sum()),
+        duplicate_faces=int(n_in - int(degenerate.sum()) - len(faces)),
+        boundary_edges=int((edge_counts == 1).sum()),
+        non_manifold_edges=int((edge_counts > 2).sum()),
+    )
+    return verts, faces, report
+
+
+def weld_mesh(tris, tol: float = WELD_TOLERANCE_MM, persist: bool = False) -> Tuple[np.ndarray, np.ndarray, dict]:
+    """
+    weld_triangles with a content-addressed cache in the shared mesh cache.
+    Lookups always happen; results are stored (and their maps pinned) only with
+    persist=True (imported assets and preloaded meshes) so ad-hoc parameter
+    sets do not fill the disk or hold file descriptors.
+    """
+    import hashlib
+    arr = np.ascontiguousarray(np.asarray(tris, dtype=np.float64).reshape(-1, 3, 3))
+    # Hash the buffer in place; tobytes() would copy a mapped mesh
+    key = mesh_cache_key("weld", digest=hashlib.sha1(memoryview(arr).cast("B")).hexdigest(), tol=tol)
+    verts = mesh_cache_get(key + "-v", pin=persist)
+    faces = mesh_cache_get(key + "-f", pin=persist)
+    stats = mesh_cache_get(key + "-r", pin=persist)
+    if verts is not None and faces is not None and stats is not None:
+        return verts, faces, dict(zip(WELD_REPORT_FIELDS, (int(x) for x in stats)))
+    verts, faces, report = weld_triangles(arr, tol)
+    if report["non_manifold_edges"]:
+        # Surface once for cached assets; ad-hoc meshes would repeat it per request
+        logger.log(
+            logging.WARNING if persist else logging.DEBUG,
+            "mesh has %d non-manifold edges after welding", report["non_manifold_edges"],
+        )
+    if persist:
+        mesh_cache_put_array(key + "-v", verts)
+        mesh_cache_put_array(key + "-f", faces)
+        mesh_cache_put_array(key + "-r", np.array([report[k] for k in WELD_REPORT_FIELDS], dtype=np.int64))
+    return verts, faces, report
+
+
+# ------------ Indexed mesh export (3MF / PLY) ------------
+
+def index_triangles(tris: List[Tri]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert a triangle soup into shared vertices and faces via weld_mesh.
+    Returns (vertices float64 (n, 3), faces int64 (m, 3)).
+    """
+    verts, faces, _report = weld_mesh(tris)
+    return verts, faces
+
+
+def placement_to_3mf_transform(placement: Placement) -> str:
+    # 3MF uses row vectors: p' = [x y z 1] * M, written as m00 m01 m02 ... m30 m31 m32
+    (tx, ty, tz), rz = placement
+    ang = math.radians(rz)
+    ca, sa = math.cos(ang), math.sin(ang)
+    return f"{ca:.9g} {sa:.9g} 0 {-sa:.9g} {ca:.9g} 0 0 0 1 {tx:.9g} {ty:.9g} {tz:.9g}"
+
+
+_3MF_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>'
+    '</Types>\n'
+)
+_3MF_RELS = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Target="/3D/3dmodel.model" Id="rel0" '
+    'Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>'
+    '</Relationships>\n'
+)
+# Rows formatted per write; keeps the XML stream's memory bounded for big assemblies
+_EXPORT_CHUNK_ROWS = 8192
+
+
+def write_3mf(objects: List[AssemblyPart], filepath: str) -> None:
+    """
+    Write a 3MF package with one indexed mesh object per part and one build
+    item per placement. The model XML is streamed into the ZIP in chunks.
+    """
+    import zipfile
+    from xml.sax.saxutils import quoteattr
+
+    with zipfile.ZipFile(filepath, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _3MF_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _3MF_RELS)
+        with zf.open("3D/3dmodel.model", "w") as out:
+            out.write(
+                b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                b'<model unit="millimeter" xml:lang="en-US" '
+                b'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">\n'
+                b'<resources>\n'
+            )
+            items: List[str] = []
+            for obj_id, (name, tris, pls) in enumerate(objects, start=1):
+                verts, faces = index_triangles(tris)
+                out.write(f'<object id="{obj_id}" type="model" name={quoteattr(name)}>\n<mesh>\n<vertices>\n'.encode("ascii"))
+                for i in range(0, len(verts), _EXPORT_CHUNK_ROWS):
+                    out.write("".join(
+                        f'<vertex x="{x:.6g}" y="{y:.6g}" z="{z:.6g}"/>\n'
+                        for x, y, z in verts[i:i + _EXPORT_CHUNK_ROWS].tolist()
+                    ).encode("ascii"))
+                out.write(b'</vertices>\n<triangles>\n')
+                for i in range(0, len(faces), _EXPORT_CHUNK_ROWS):
+                    out.write("".join(
+                        f'<triangle v1="{a}" v2="{b}" v3="{c}"/>\n'
+                        for a, b, c in faces[i:i + _EXPORT_CHUNK_ROWS].tolist()
+                    ).encode("ascii"))
+                out.write(b'</triangles>\n</mesh>\n</object>\n')
+                items += [
+                    f'<item objectid="{obj_id}" transform="{placement_to_3mf_transform(pl)}"/>\n'
+                    for pl in pls
+                ]
+            out.write(b'</resources>\n<build>\n')
+            out.write("".join(items).encode("ascii"))
+            out.write(b'</build>\n</model>\n')
+
+
+def write_ply(tris: List[Tri], filepath: str) -> None:
+    # Binary little-endian PLY with float32 vertices and int32 index lists
+    verts, faces = index_triangles(tris)
+    face_rows = np.empty(len(faces), dtype=[("n", "u1"), ("idx", "<i4", (3,))])
+    face_rows["n"] = 3
+    face_rows["idx"] = faces
+    header = (
+        "ply\n"
+        "format binary_little_endian 1.0\n"
+        "comment generated by prosthetic hand generator\n"
+        f"element vertex {len(verts)}\n"
+        "property float x\n"
+        "property float y\n"
+        "property float z\n"
+        f"element face {len(faces)}\n"
+        "property list uchar int vertex_indices\n"
+        "end_header\n"
+    )
+    with open(filepath, "wb") as f:
+        f.write(header.encode("ascii"))
+        f.write(verts.astype("<f4").tobytes())
+        f.write(face_rows.tobytes())
+
+
+# ------------ Thumbnails (NumPy z-buffer rasterizer) ------------
+
+THUMB_SIZE = (160, 120)
+THUMB_BACKGROUND = (255, 255, 255)
+THUMB_BASE_COLOR = (96, 140, 200)
+# Max candidate pixels rasterized per batch; bounds temporary array memory
+THUMB_BATCH_PIXELS = 1 << 21
+
+
+def thumbnail_path_for(filename: str) -> str:
+    # Thumbnails live beside the generated file: cuff_x.stl -> cuff_x.png
+    return os.path.join(OUTPUT_DIR, os.path.splitext(filename)[0] + ".png")
+
+
+def write_thumbnail(tris: List[Tri], path: str) -> None:
+    png = render_thumbnail_png(tris)
+    # Write then rename so concurrent workers never serve a partial PNG
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(png)
+    os.replace(tmp_path, path)
+
+
+def render_thumbnail_png(
+    tris: List[Tri],
+    width: int = THUMB_SIZE[0],
+    height: int = THUMB_SIZE[1],
+    angle_x: float = 0.5,
+    angle_y: float = -0.6,
+) -> bytes:
+    """
+    Rasterize triangles into a small shaded PNG using a z-buffer.
+    The default view angles match the in-browser preview.
+    """
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = THUMB_BACKGROUND
+    arr = np.asarray(tris, dtype=np.float64).reshape(-1, 3, 3)
+    if len(arr) == 0:
+        return encode_png_rgb(img)
+
+    # Same rotation as rotMat() in index.html (R = Ry * Rx), row-vector form
+    cx, sx, cy, sy = math.cos(angle_x), math.sin(angle_x), math.cos(angle_y), math.sin(angle_y)
+    rot = np.array([
+        [cy, sy * sx, sy * cx],
+        [0.0, cx, -sx],
+        [-sy, cy * sx, cy * cx],
+    ])
+    v = arr @ rot.T
+
+    # Two-sided Lambert shading from a head-on light
+    n = np.cross(v[:, 1] - v[:, 0], v[:, 2] - v[:, 0])
+    n_len = np.linalg.norm(n, axis=1)
+    shade = 0.35 + 0.65 * np.abs(n[:, 2]) / np.where(n_len > 0, n_len, 1.0)
+
+    # Fit the projected bounding box into the image with a small margin
+    lo = v.reshape(-1, 3).min(axis=0)
+    hi = v.reshape(-1, 3).max(axis=0)
+    margin = 4
+    span_x = max(hi[0] - lo[0], 1e-9)
+    span_y = max(hi[1] - lo[1], 1e-9)
+    f = min((width - 2 * margin) / span_x, (height - 2 * margin) / span_y)
+    off_x = (width - f * span_x) / 2.0
+    off_y = (height - f * span_y) / 2.0
+    sxy = np.empty(v.shape[:2] + (2,))
+    sxy[..., 0] = (v[..., 0] - lo[0]) * f + off_x
+    sxy[..., 1] = (hi[1] - v[..., 1]) * f + off_y  # image rows grow downward
+    z = v[..., 2]  # larger z is nearer the viewer
+
+    # Per-triangle pixel bounding boxes (pixel centers at +0.5)
+    x0 = np.clip(np.floor(sxy[..., 0].min(axis=1) - 0.5), 0, width - 1).astype(np.int64)
+    x1 = np.clip(np.ceil(sxy[..., 0].max(axis=1) - 0.5), 0, width - 1).astype(np.int64)
+    y0 = np.clip(np.floor(sxy[..., 1].min(axis=1) - 0.5), 0, height - 1).astype(np.int64)
+    y1 = np.clip(np.ceil(sxy[..., 1].max(axis=1) - 0.5), 0, height - 1).astype(np.int64)
+    bw = x1 - x0 + 1
+    counts = bw * (y1 - y0 + 1)
+
+    zbuf = np.full(width * height, -np.inf)
+    color = np.zeros(width * height)
+    fragments = []  # (pixel, depth, shade) batches, resolved after the depth pass
+
+    ends = np.cumsum(counts)
+    start = 0
+    while start < len(arr):
+        # Take as many triangles as fit in one batch (always at least one)
+        limit = (ends[start - 1] if start else 0) + THUMB_BATCH_PIXELS
+        stop = max(start + 1, int(np.searchsorted(ends, limit, side="right")))
+        idx = np.arange(start, stop)
+        start = stop
+
+        c = counts[idx]
+        t = np.repeat(idx, c)
+        local = np.arange(int(c.sum())) - np.repeat(np.cumsum(c) - c, c)
+        px = x0[t] + local % bw[t]
+        py = y0[t] + local // bw[t]
+        qx = px + 0.5
+        qy = py + 0.5
+
+        a, b, d = sxy[t, 0], sxy[t, 1], sxy[t, 2]
+        area = (b[:, 0] - a[:, 0]) * (d[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (d[:, 0] - a[:, 0])
+        w0 = (b[:, 0] - qx) * (d[:, 1] - qy) - (b[:, 1] - qy) * (d[:, 0] - qx)
+        w1 = (d[:, 0] - qx) * (a[:, 1] - qy) - (d[:, 1] - qy) * (a[:, 0] - qx)
+        w2 = area - w0 - w1
+        safe = np.where(area != 0, area, 1.0)
+        w0, w1, w2 = w0 / safe, w1 / safe, w2 / safe
+        inside = (area != 0) & (w0 >= 0) & (w1 >= 0) & (w2 >= 0)
+        if not inside.any():
+            continue
+        t = t[inside]
+        pix = py[inside] * width + px[inside]
+        depth = w0[inside] * z[t, 0] + w1[inside] * z[t, 1] + w2[inside] * z[t, 2]
+        np.maximum.at(zbuf, pix, depth)
+        fragments.append((pix, depth, shade[t]))
+
+    for pix, depth, sh in fragments:
+        front = depth >= zbuf[pix]
+        color[pix[front]] = sh[front]
+
+    covered = np.isfinite(zbuf).reshape(height, width)
+    lit = color.reshape(height, width)[covered][:, None] * np.array(THUMB_BASE_COLOR, dtype=np.float64)
+    img[covered] = np.clip(lit + 40.0, 0, 255).astype(np.uint8)
+    return encode_png_rgb(img)
+
+
+def encode_png_rgb(img: np.ndarray) -> bytes:
+    # Minimal PNG writer (8-bit RGB, filter type 0) so no imaging library is needed
+    height, width, _ = img.shape
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = img.reshape(height, width * 3)
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", header),
+        chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        chunk(b"IEND", b""),
+    ])
+
+
 # ------------ External model import (STL) ------------
 
 def mirror_tris(tris: List[Tri], axis: str = 'x') -> List[Tri]:
@@ -732,6 +1583,13 @@ def mirror_tris(tris: List[Tri], axis: str = 'x') -> List[Tri]:
     return [(mir(a), mir(c), mir(b)) for (a,b,c) in tris]
 
 
+def mirror_array(tris: np.ndarray, axis: str = 'x') -> np.ndarray:
+    # mirror_tris for (n, 3, 3) arrays
+    flip = np.ones(3)
+    flip[{"x": 0, "y": 1}.get(axis.lower(), 2)] = -1.0
+    return tris[:, [0, 2, 1]] * flip
+
+
 PART_FILE_MAP = {
     "palm": "palm.stl",
     "gauntlet": "gauntlet.stl",
@@ -743,17 +1601,41 @@ PART_FILE_MAP = {
 }
 
 
+def has_external_part_mesh(part: str) -> bool:
+    filename = PART_FILE_MAP.get(part)
+    return bool(filename) and os.path.exists(os.path.join(ASSETS_DIR, filename))
+
+
 def load_external_part_mesh(part: str) -> Optional[List[Tri]]:
+    arr = load_external_part_array(part)
+    return None if arr is None else arr.tolist()
+
+
+def load_external_part_array(part: str) -> Optional[np.ndarray]:
+    # Imported asset as an (n, 3, 3) array, mapped from the mesh cache when possible
     filename = PART_FILE_MAP.get(part)
     if not filename:
         return None
     path = os.path.join(ASSETS_DIR, filename)
-    if not os.path.exists(path):
+    try:
+        st = os.stat(path)
+    except OSError:
         return None
+    # Parsed assets are cached by file identity, so edits on disk are picked up
+    key = mesh_cache_key("asset", file=filename, mtime_ns=st.st_mtime_ns, size=st.st_size)
+    # Pinned: one map per asset file, used by most requests
+    cached = mesh_cache_get(key, pin=True)
+    if cached is not None:
+        return cached
     try:
-        return load_stl_triangles(path)
+        tris = load_stl_triangles(path)
     except Exception:
         return None
+    mesh_cache_put(key, tris)
+    # Weld once per asset so indexed exports and STEP sewing reuse the result
+    weld_mesh(tris, persist=True)
+    cached = mesh_cache_get(key, pin=True)
+    return cached if cached is not None else np.asarray(tris, dtype=np.float64).reshape(-1, 3, 3)
 
 
 def load_stl_triangles(path: str) -> List[Tri]:
@@ -797,57 +1679,328 @@ def load_stl_triangles(path: str) -> List[Tri]:
     return tris
 
 
-# ------------ Optional STEP export via pythonocc-core or OCP (CadQuery) ------------
-_OCC_AVAILABLE = False
-try:
-    # Prefer OCP wheels (widely available)
-    from OCP.gp import gp_Pnt
-    from OCP.BRepBuilderAPI import (
-        BRepBuilderAPI_MakePolygon,
-        BRepBuilderAPI_MakeFace,
-        BRepBuilderAPI_Sewing,
-    )
-    from OCP.STEPControl import STEPControl_Writer, STEPControl_AsIs
-    from OCP.IFSelect import IFSelect_RetDone
-    _OCC_AVAILABLE = True
-except Exception:
+# ------------ Shared mesh cache (mmap'd .npy files) ------------
+
+MESH_CACHE_DIR = os.path.join(BASE_DIR, "data", "mesh_cache")
+# Bump when geometry generation changes so stale cached meshes are ignored
+MESH_CACHE_VERSION = 3
+# key -> read-only memmap, only for pinned entries (preloaded meshes, imported
+# assets); maps opened in the master before fork are shared by workers
+_mesh_cache_maps: dict = {}
+
+
+def mesh_cache_key(kind: str, **fields) -> str:
+    import hashlib
+    import json
+    payload = json.dumps(dict(fields, kind=kind, v=MESH_CACHE_VERSION), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def part_mesh_cache_key(part: str, params: dict) -> str:
+    # The design name does not affect geometry
+    geom = {k: v for k, v in params.items() if k != "name"}
+    return mesh_cache_key("part", part=part, params=geom)
+
+
+def mesh_cache_path(key: str) -> str:
+    return os.path.join(MESH_CACHE_DIR, key[:2], key + ".npy")
+
+
+def mesh_cache_get(key: str, pin: bool = False) -> Optional[np.ndarray]:
+    """
+    Cached array for `key`, or None. pin=True maps the file read-only and keeps
+    the map (and its file descriptor) for the life of the process; this is for
+    the bounded set preload_shared_assets() opens in the master. Other hits
+    are read into memory and keep nothing open, however large the cache grows.
+    """
+    arr = _mesh_cache_maps.get(key)
+    if arr is not None:
+        return arr
+    path = mesh_cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        arr = np.load(path, mmap_mode="r" if pin else None)
+    except (OSError, ValueError):
+        return None
+    if pin:
+        _mesh_cache_maps[key] = arr
+    return arr
+
+
+def mesh_cache_put(key: str, tris: List[Tri]) -> None:
+    mesh_cache_put_array(key, np.asarray(tris, dtype=np.float64).reshape(-1, 3, 3))
+
+
+def mesh_cache_put_array(key: str, arr: np.ndarray) -> None:
+    # Best effort: a read-only data dir just means no caching
+    path = mesh_cache_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp_path, path)
+    except OSError:
+        return
+
+
+def preload_shared_assets() -> None:
+    """
+    Parse imported Phoenix assets, the layout file and default-parameter meshes
+    once, into the mmap'd mesh cache. Call in the server master before workers
+    fork (gunicorn preload_app, Passenger smart spawning) so they share the
+    pages copy-on-write instead of each parsing STLs on first use.
+    """
+    load_layout_placements()
+    for part in ASSEMBLY_PARTS:
+        arr = load_external_part_array(part)
+        if arr is None:
+            # Same params a request submitting the part's default form produces
+            params = parse_params(default_params(part), part)
+            key = part_mesh_cache_key(part, params)
+            if not os.path.exists(mesh_cache_path(key)):
+                mesh_cache_put(key, generate_part_mesh_uncached(part, **params))
+            arr = mesh_cache_get(key, pin=True)
+        if arr is not None:
+            # Also pins the welded mesh used by indexed exports and STEP
+            weld_mesh(arr, persist=True)
+    # Optional deploy-time warm-up of the sizing grid (resumes if interrupted)
+    if os.environ.get("WARM_CACHE_ON_START") == "1":
+        warm_mesh_cache_once(load_warm_grid())
+
+
+def payload_cache_path(key: str) -> str:
+    return os.path.join(MESH_CACHE_DIR, key[:2], key + ".stl.gz")
+
+
+def payload_cache_get(key: str) -> Optional[bytes]:
+    # Gzipped ASCII STL exactly as /stl returns it for these params
+    try:
+        with open(payload_cache_path(key), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def payload_cache_put(key: str, stl: bytes) -> None:
+    path = payload_cache_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            f.write(gzip.compress(stl, 6))
+        os.replace(tmp_path, path)
+    except OSError:
+        return
+
+
+# ------------ Cache warming for common size ranges ------------
+
+WARM_GRID_PATH = os.path.join(BASE_DIR, "data", "warm_grid.json")
+# Sizing-chart steps per part; other params come from default_params(part).
+# Values are lists or {"start", "stop", "step"} ranges (stop inclusive).
+DEFAULT_WARM_GRID = {
+    "cuff": {
+        "inner_radius_mm": {"start": 30.0, "stop": 45.0, "step": 1.0},
+        "length_mm": [100.0, 120.0, 140.0, 160.0],
+    },
+    "finger": {
+        "inner_radius_mm": {"start": 8.0, "stop": 13.0, "step": 0.5},
+        "length_mm": [45.0, 55.0, 65.0],
+    },
+    "gauntlet": {
+        "inner_radius_mm": {"start": 35.0, "stop": 50.0, "step": 1.0},
+        "length_mm": [80.0, 90.0, 100.0],
+    },
+    "proximal_finger": {
+        "inner_radius_mm": {"start": 9.0, "stop": 13.0, "step": 0.5},
+    },
+    "proximal_thumb": {
+        "inner_radius_mm": {"start": 11.0, "stop": 15.0, "step": 0.5},
+    },
+}
+
+
+def load_warm_grid(path: Optional[str] = None) -> dict:
+    path = path or WARM_GRID_PATH
+    if not os.path.exists(path):
+        return DEFAULT_WARM_GRID
+    import json
+    with open(path, "r") as f:
+        return json.load(f).get("parts", {})
+
+
+def expand_warm_grid(grid: dict) -> List[Tuple[str, dict]]:
+    """
+    Expand a per-part grid into (part, params) entries, parsed exactly like
+    request params. Each point yields the full-resolution params and, when
+    different, the grid-capped params the preview routes use.
+    """
+    import itertools
+
+    def values(spec) -> list:
+        if isinstance(spec, dict):
+            start, stop, step = float(spec["start"]), float(spec["stop"]), float(spec["step"])
+            n = int(math.floor((stop - start) / step + 1e-9)) + 1
+            return [round(start + i * step, 6) for i in range(n)]
+        return list(spec) if isinstance(spec, list) else [spec]
+
+    entries: List[Tuple[str, dict]] = []
+    seen = set()
+    for part, axes in grid.items():
+        base = default_params(part)
+        names = sorted(axes)
+        for combo in itertools.product(*(values(axes[n]) for n in names)):
+            full = parse_params(dict(base, **dict(zip(names, combo))), part)
+            preview = cap_preview_resolution(dict(full))
+            for params in (full, preview):
+                key = part_mesh_cache_key(part, params)
+                if key not in seen:
+                    seen.add(key)
+                    entries.append((part, params))
+    return entries
+
+
+def _warm_cache_entry(part: str, params: dict) -> str:
+    # Process-pool task: generate and store one mesh plus its /stl payload
+    key = part_mesh_cache_key(part, params)
+    tris = generate_part_mesh_uncached(part, **params)
+    mesh_cache_put(key, tris)
+    payload_cache_put(key, triangles_to_stl_bytes(tris, name=f"preview_{part}"))
+    return key
+
+
+def warm_mesh_cache(grid: dict, workers: Optional[int] = None, resume: bool = True) -> int:
+    """
+    Fill the mesh and payload caches for every grid point on a process pool.
+    With resume, entries already on disk are skipped, so an interrupted run
+    continues where it stopped. Returns the number of entries generated.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    entries = expand_warm_grid(grid)
+    todo = []
+    for part, params in entries:
+        if has_external_part_mesh(part):
+            continue  # imported assets ignore these params
+        key = part_mesh_cache_key(part, params)
+        if resume and os.path.exists(mesh_cache_path(key)) and os.path.exists(payload_cache_path(key)):
+            continue
+        todo.append((part, params))
+    click.echo(f"warm-cache: {len(entries)} grid entries, {len(entries) - len(todo)} already cached, {len(todo)} to generate")
+    if not todo:
+        return 0
+
+    done = 0
+    step = max(1, len(todo) // 20)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_warm_cache_entry, part, params): part for part, params in todo}
+        for fut in as_completed(futures):
+            fut.result()
+            done += 1
+            if done % step == 0 or done == len(todo):
+                click.echo(f"warm-cache: {done}/{len(todo)} ({100 * done // len(todo)}%)")
+    return done
+
+
+WARM_LOCK_PATH = os.path.join(MESH_CACHE_DIR, ".warm.lock")
+
+
+def warm_mesh_cache_once(grid: dict) -> int:
+    """
+    warm_mesh_cache for startup hooks. Without preloading, every worker process
+    runs preload_shared_assets() at import, so only the one holding an
+    exclusive lock on WARM_LOCK_PATH sweeps; the others skip it and serve.
+    """
     try:
-        # Fallback to pythonocc-core (may require conda/OS pkgs)
-        from OCC.Core.gp import gp_Pnt
-        from OCC.Core.BRepBuilderAPI import (
-            BRepBuilderAPI_MakePolygon,
-            BRepBuilderAPI_MakeFace,
-            BRepBuilderAPI_Sewing,
+        import fcntl
+    except ImportError:  # no flock (Windows): single-process servers only
+        return warm_mesh_cache(grid)
+    os.makedirs(MESH_CACHE_DIR, exist_ok=True)
+    with open(WARM_LOCK_PATH, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logger.info("warm-cache: already running in another process, skipping")
+            return 0
+        return warm_mesh_cache(grid)
+
+
+# ------------ Optional STEP export via pythonocc-core or OCP (CadQuery) ------------
+
+# Imported on first STEP export so workers that never export do not pay for it
+_occ = None  # namespace of OCC classes, or False once known to be unavailable
+
+
+def load_occ():
+    global _occ
+    if _occ is None:
+        from types import SimpleNamespace
+        try:
+            # Prefer OCP wheels (widely available)
+            from OCP.gp import gp_Pnt
+            from OCP.BRepBuilderAPI import (
+                BRepBuilderAPI_MakePolygon,
+                BRepBuilderAPI_MakeFace,
+                BRepBuilderAPI_Sewing,
+            )
+            from OCP.STEPControl import STEPControl_Writer, STEPControl_AsIs
+            from OCP.IFSelect import IFSelect_RetDone
+        except Exception:
+            try:
+                # Fallback to pythonocc-core (may require conda/OS pkgs)
+                from OCC.Core.gp import gp_Pnt
+                from OCC.Core.BRepBuilderAPI import (
+                    BRepBuilderAPI_MakePolygon,
+                    BRepBuilderAPI_MakeFace,
+                    BRepBuilderAPI_Sewing,
+                )
+                from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
+                from OCC.Core.IFSelect import IFSelect_RetDone
+            except Exception:
+                _occ = False
+                return None
+        _occ = SimpleNamespace(
+            gp_Pnt=gp_Pnt,
+            BRepBuilderAPI_MakePolygon=BRepBuilderAPI_MakePolygon,
+            BRepBuilderAPI_MakeFace=BRepBuilderAPI_MakeFace,
+            BRepBuilderAPI_Sewing=BRepBuilderAPI_Sewing,
+            STEPControl_Writer=STEPControl_Writer,
+            STEPControl_AsIs=STEPControl_AsIs,
+            IFSelect_RetDone=IFSelect_RetDone,
         )
-        from OCC.Core.STEPControl import STEPControl_Writer, STEPControl_AsIs
-        from OCC.Core.IFSelect import IFSelect_RetDone
-        _OCC_AVAILABLE = True
-    except Exception:
-        _OCC_AVAILABLE = False
+    return _occ or None
 
 
 def write_step_from_tris(tris: List[Tri], filepath: str) -> None:
-    if not _OCC_AVAILABLE:
+    occ = load_occ()
+    if occ is None:
         raise RuntimeError("STEP export unavailable: install OCP (preferred) or pythonocc-core.")
 
+    # Weld first: corners shared by neighbouring faces become identical points
+    # and degenerate/duplicate faces that upset sewing are already gone
+    verts, faces, _report = weld_mesh(tris)
+    pnts = [occ.gp_Pnt(x, y, z) for x, y, z in verts.tolist()]
+
     # Build a sewed shell from triangle faces
-    sewing = BRepBuilderAPI_Sewing(1.0e-6)
-    for a, b, c in tris:
-        poly = BRepBuilderAPI_MakePolygon()
-        poly.Add(gp_Pnt(a[0], a[1], a[2]))
-        poly.Add(gp_Pnt(b[0], b[1], b[2]))
-        poly.Add(gp_Pnt(c[0], c[1], c[2]))
+    sewing = occ.BRepBuilderAPI_Sewing(1.0e-6)
+    for a, b, c in faces.tolist():
+        poly = occ.BRepBuilderAPI_MakePolygon()
+        poly.Add(pnts[a])
+        poly.Add(pnts[b])
+        poly.Add(pnts[c])
         poly.Close()
         wire = poly.Wire()
-        face = BRepBuilderAPI_MakeFace(wire, True).Face()
+        face = occ.BRepBuilderAPI_MakeFace(wire, True).Face()
         sewing.Add(face)
     sewing.Perform()
     shell_shape = sewing.SewedShape()
 
-    writer = STEPControl_Writer()
-    writer.Transfer(shell_shape, STEPControl_AsIs)
+    writer = occ.STEPControl_Writer()
+    writer.Transfer(shell_shape, occ.STEPControl_AsIs)
     status = writer.Write(filepath)
-    if status != IFSelect_RetDone:
+    if status != occ.IFSelect_RetDone:
         raise RuntimeError("Failed to write STEP file.")
 
 
@@ -0,0 +1,15 @@
+# Gunicorn settings, picked up automatically when started from this directory:
+#   gunicorn wsgi:app
+# Import the app (and run preload_shared_assets) once in the master so workers
+# fork with the parsed meshes already mapped and share them copy-on-write.
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:" + os.environ.get("PORT", "8000"))
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+preload_app = True
+# Threaded workers: a live-preview stream (/preview/stream) holds a thread while
+# its tab is being edited (closed after PREVIEW_IDLE_CLOSE_S without edits), so
+# a sync worker would be tied up by a single browser tab. Capacity for streams
+# plus in-flight requests is workers * threads.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
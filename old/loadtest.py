@@ -0,0 +1,375 @@
+"""
+Local load test for the generator app.
+
+Starts the app (gunicorn or the Flask server) on a local port, or targets an
+already running URL. Simulated users send a weighted mix of /stl, /stl_all,
+/generate and /history requests, plus /export_step when asked for (it needs
+OCP). Parameters are sampled around default_params. The tool reports
+throughput, latency percentiles, error rate (501 "not installed" responses
+are counted separately) and server memory over time: RSS and Pss per process
+and summed. Each run is saved as JSON for later comparison.
+
+Examples:
+  python loadtest.py --server gunicorn --workers 4 --users 16 --duration 60
+  python loadtest.py --url http://127.0.0.1:5000 --mix stl=80,history=20
+  python loadtest.py --compare data/loadtest/run_a.json data/loadtest/run_b.json
+
+Note: /generate writes STL files and history rows, so run against a scratch
+checkout or clean up output/ and data/cuffs.db afterwards.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app import BASE_DIR, ASSEMBLY_PARTS, SHELL_PARTS, default_params
+
+
+RUNS_DIR = os.path.join(BASE_DIR, "data", "loadtest")
+# export_step is left out: without OCP it is a fast 501, which would skew runs
+# compared across hosts. Add it with --mix where OCP is installed.
+DEFAULT_MIX = "stl=58,stl_all=16,generate=10,history=16"
+
+
+# ------------ Parameter sampling ------------
+
+def sample_params(part: str, rng: random.Random) -> Dict[str, str]:
+    # Perturb the part defaults the way real users do: mostly size changes
+    p = default_params(part)
+    out = {"name": p["name"], "scale": "1.0"}
+    if part not in SHELL_PARTS:
+        out["scale"] = f"{min(1.5, max(0.7, rng.gauss(1.0, 0.1))):.2f}"
+        return out
+    out.update(
+        inner_radius_mm=f"{max(5.0, rng.gauss(p['inner_radius_mm'], 0.1 * p['inner_radius_mm'])):.1f}",
+        length_mm=f"{max(10.0, rng.gauss(p['length_mm'], 0.1 * p['length_mm'])):.1f}",
+        arc_deg=f"{min(330.0, max(30.0, rng.gauss(p['arc_deg'], 15.0))):.0f}",
+        thickness_mm=f"{min(10.0, max(1.0, rng.gauss(p['thickness_mm'], 0.3))):.1f}",
+        grid_u=str(p["grid_u"]),
+        grid_v=str(p["grid_v"]),
+        hole_every_n=str(rng.choice([0, p["hole_every_n"], p["hole_every_n"], p["hole_every_n"] + 1])),
+        hole_size_cells=str(p["hole_size_cells"]),
+        taper_ratio=f"{min(0.9, max(0.0, rng.gauss(p['taper_ratio'], 0.05))):.2f}",
+    )
+    return out
+
+
+def build_request(kind: str, rng: random.Random) -> Tuple[str, str, Optional[bytes]]:
+    # Returns (method, path with query, body)
+    if kind == "history":
+        return "GET", "/history", None
+    if kind in ("stl_all", "export_step_all"):
+        qs = {"preview": "1", "hand": rng.choice(["right", "right", "left"])}
+        for part in ASSEMBLY_PARTS:
+            for k, v in sample_params(part, rng).items():
+                qs[f"{part}.{k}"] = v
+        if kind == "export_step_all":
+            qs["all"] = "1"
+            return "GET", "/export_step?" + urllib.parse.urlencode(qs), None
+        return "GET", "/stl_all?" + urllib.parse.urlencode(qs), None
+    part = rng.choice(ASSEMBLY_PARTS)
+    params = sample_params(part, rng)
+    params["part"] = part
+    if kind == "generate":
+        return "POST", "/generate", urllib.parse.urlencode(params).encode("ascii")
+    if kind == "export_step":
+        return "GET", "/export_step?" + urllib.parse.urlencode(params), None
+    params["preview"] = "1"
+    return "GET", "/stl?" + urllib.parse.urlencode(params), None
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in spec.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip()
+        if kind not in ("stl", "stl_all", "generate", "history", "export_step", "export_step_all"):
+            raise SystemExit(f"unknown request kind in --mix: {kind}")
+        mix.append((kind, float(weight or 1)))
+    return mix
+
+
+# ------------ Server process and RSS sampling ------------
+
+def start_server(kind: str, port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port))
+    if kind == "gunicorn":
+        cmd = ["gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "wsgi:app"]
+    else:
+        cmd = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port), "--no-reload"]
+    return subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"server at {base_url} did not become ready in {timeout:.0f}s")
+
+
+def process_tree_memory_kb(root_pid: int) -> Dict[int, Tuple[int, int]]:
+    """
+    (VmRSS, Pss) in kB for root_pid and all its descendants (Linux /proc).
+    RSS counts pages shared copy-on-write with the master in every worker; Pss
+    splits each shared page between the processes mapping it, so the Pss sum
+    is the real footprint. Pss is 0 where smaps_rollup is unavailable.
+    """
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    out: Dict[int, Tuple[int, int]] = {}
+    stack = [root_pid]
+    while stack:
+        pid = stack.pop()
+        rss = read_proc_kb(f"/proc/{pid}/status", "VmRSS:")
+        if rss is None:
+            continue
+        out[pid] = (rss, read_proc_kb(f"/proc/{pid}/smaps_rollup", "Pss:") or 0)
+        stack.extend(children.get(pid, []))
+    return out
+
+
+def read_proc_kb(path: str, field: str) -> Optional[int]:
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+# ------------ Load generation ------------
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: List[Tuple[str, float, float, int]] = []  # (kind, start, seconds, status)
+
+    def add(self, kind: str, start: float, seconds: float, status: int):
+        with self.lock:
+            self.samples.append((kind, start, seconds, status))
+
+
+def user_loop(base_url: str, mix, rec: Recorder, stop_at: float, think: float, seed: int):
+    rng = random.Random(seed)
+    kinds = [k for k, _ in mix]
+    weights = [w for _, w in mix]
+    while time.time() < stop_at:
+        kind = rng.choices(kinds, weights)[0]
+        method, path, body = build_request(kind, rng)
+        req = urllib.request.Request(base_url + path, data=body, method=method)
+        t0 = time.perf_counter()
+        started = time.time()
+        try:
+            with urllib.request.urlopen(req, timeout=120) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0  # connection error / timeout
+        rec.add(kind, started, time.perf_counter() - t0, status)
+        if think > 0:
+            time.sleep(rng.expovariate(1.0 / think))
+
+
+def percentile(sorted_vals: List[float], pct: float) -> float:
+    # Nearest-rank percentile
+    if not sorted_vals:
+        return 0.0
+    idx = max(0, min(len(sorted_vals) - 1, math.ceil(pct / 100.0 * len(sorted_vals)) - 1))
+    return sorted_vals[idx]
+
+
+def summarize(samples, duration: float) -> dict:
+    def stats(rows) -> dict:
+        lat = sorted(r[2] for r in rows)
+        # 501 = feature not installed on this host (STEP without OCP); not a failure
+        unavailable = sum(1 for r in rows if r[3] == 501)
+        errors = sum(1 for r in rows if not 200 <= r[3] < 400) - unavailable
+        codes: Dict[str, int] = {}
+        for r in rows:
+            codes[str(r[3])] = codes.get(str(r[3]), 0) + 1
+        return dict(
+            requests=len(rows),
+            throughput_rps=len(rows) / duration if duration else 0.0,
+            p50_ms=1000 * percentile(lat, 50),
+            p95_ms=1000 * percentile(lat, 95),
+            p99_ms=1000 * percentile(lat, 99),
+            max_ms=1000 * (lat[-1] if lat else 0.0),
+            error_rate=errors / len(rows) if rows else 0.0,
+            unavailable_rate=unavailable / len(rows) if rows else 0.0,
+            status_codes=codes,
+        )
+
+    by_kind: Dict[str, list] = {}
+    for r in samples:
+        by_kind.setdefault(r[0], []).append(r)
+    return dict(overall=stats(samples), endpoints={k: stats(v) for k, v in sorted(by_kind.items())})
+
+
+def print_summary(summary: dict, rss: List[list]):
+    head = f"{'endpoint':<16}{'reqs':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'501':>8}"
+    print(head)
+    print("-" * len(head))
+    rows = list(summary["endpoints"].items()) + [("ALL", summary["overall"])]
+    for name, s in rows:
+        print(f"{name:<16}{s['requests']:>7}{s['throughput_rps']:>8.2f}{s['p50_ms']:>9.0f}"
+              f"{s['p95_ms']:>9.0f}{s['p99_ms']:>9.0f}{100 * s['error_rate']:>7.1f}%"
+              f"{100 * s.get('unavailable_rate', 0.0):>7.1f}%")
+    if rss:
+        # Rows: [t, rss_kb, nprocs, pss_kb, {pid: [rss_kb, pss_kb]}]; pid order puts the master first
+        for label, col in (("RSS", 1), ("PSS", 3)):
+            peak = max(r[col] for r in rss)
+            print(f"server {label} (sum): start {rss[0][col] / 1024:.0f} MiB, peak {peak / 1024:.0f} MiB, "
+                  f"end {rss[-1][col] / 1024:.0f} MiB ({rss[-1][2]} processes)")
+        print(f"{'process at end':<22}{'RSS MiB':>9}{'PSS MiB':>9}")
+        for i, (pid, (kb, pss)) in enumerate(rss[-1][4].items()):
+            role = "master" if i == 0 else "worker"
+            print(f"  {role} {pid:<13}{kb / 1024:>9.0f}{pss / 1024:>9.0f}")
+
+
+def compare_runs(paths: List[str]):
+    runs = []
+    for p in paths:
+        with open(p, "r") as f:
+            runs.append(json.load(f))
+    print(f"{'run':<40}{'users':>6}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"
+          f"{'peak RSS':>10}{'peak PSS':>10}")
+    for p, run in zip(paths, runs):
+        s = run["summary"]["overall"]
+        peak = max((r[1] for r in run.get("rss", [])), default=0)
+        # Runs saved before PSS sampling have 3-column rows
+        peak_pss = max((r[3] for r in run.get("rss", []) if len(r) > 3), default=0)
+        label = run.get("label") or os.path.basename(p)
+        print(f"{label[:39]:<40}{run['args']['users']:>6}{s['throughput_rps']:>8.2f}{s['p50_ms']:>9.0f}"
+              f"{s['p95_ms']:>9.0f}{s['p99_ms']:>9.0f}{100 * s['error_rate']:>7.1f}%{peak / 1024:>7.0f} MiB"
+              f"{peak_pss / 1024:>7.0f} MiB")
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load test the generator app with a realistic request mix.")
+    ap.add_argument("--server", choices=["gunicorn", "flask", "none"], default="gunicorn",
+                    help="start this server locally (none: use --url)")
+    ap.add_argument("--url", default=None, help="target an already running app instead")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=2, help="gunicorn worker count")
+    ap.add_argument("--users", type=int, default=8, help="concurrent simulated users")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    ap.add_argument("--think", type=float, default=0.5, help="mean think time between requests (s)")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted request kinds (default {DEFAULT_MIX})")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--label", default="", help="name stored with the run")
+    ap.add_argument("--out", default=None, help="run JSON path (default data/loadtest/<time>.json)")
+    ap.add_argument("--compare", nargs="+", metavar="RUN_JSON", help="print saved runs side by side and exit")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        compare_runs(args.compare)
+        return
+
+    mix = parse_mix(args.mix)
+    proc = None
+    base_url = (args.url or f"http://127.0.0.1:{args.port}").rstrip("/")
+    if not args.url and args.server != "none":
+        proc = start_server(args.server, args.port, args.workers)
+    try:
+        wait_ready(base_url)
+        rec = Recorder()
+        rss: List[list] = []
+        t_start = time.time()
+        stop_at = t_start + args.duration
+        stop_sampler = threading.Event()
+
+        def sample_rss():
+            while not stop_sampler.is_set():
+                mem = process_tree_memory_kb(proc.pid)
+                rss.append([
+                    round(time.time() - t_start, 2),
+                    sum(kb for kb, _pss in mem.values()),
+                    len(mem),
+                    sum(pss for _kb, pss in mem.values()),
+                    {pid: list(v) for pid, v in mem.items()},
+                ])
+                stop_sampler.wait(1.0)
+
+        sampler = threading.Thread(target=sample_rss, daemon=True) if proc else None
+        if sampler:
+            sampler.start()
+        users = [
+            threading.Thread(target=user_loop, args=(base_url, mix, rec, stop_at, args.think, args.seed + i), daemon=True)
+            for i in range(args.users)
+        ]
+        for t in users:
+            t.start()
+        for t in users:
+            t.join()
+        stop_sampler.set()
+        if sampler:
+            sampler.join()
+        elapsed = time.time() - t_start
+    finally:
+        if proc:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    summary = summarize(rec.samples, elapsed)
+    print_summary(summary, rss)
+
+    run = dict(
+        label=args.label,
+        created_at=datetime.utcnow().isoformat(timespec="seconds"),
+        git_revision=git_revision(),
+        args=vars(args),
+        elapsed_s=elapsed,
+        summary=summary,
+        rss=rss,
+        samples=[[k, round(s - t_start, 4), round(d, 5), c] for k, s, d, c in rec.samples],
+    )
+    out = args.out or os.path.join(RUNS_DIR, datetime.utcnow().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(run, f)
+    print(f"saved run to {out}")
+
+
+if __name__ == "__main__":
+    main()
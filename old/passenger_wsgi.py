@@ -1,5 +1,8 @@
-from app import create_app
+from app import create_app, preload_shared_assets
 
 # Entry point for cPanel/Passenger
+# With smart spawning this runs once in the preloader, before workers fork
+# Processes are single-threaded: an open live-preview stream occupies one for up
+# to PREVIEW_IDLE_CLOSE_S after its last edit, so size PassengerMaxPoolSize for that
+preload_shared_assets()
 application = create_app()
-
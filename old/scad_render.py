@@ -0,0 +1,339 @@
+"""
+Server-side OpenSCAD rendering for the models/ sources used by the browser
+configurator.
+
+A render takes a SCAD entry point from models/ plus variable assignments
+(the same `name = value` pairs buildAssignmentString emits in app.js) and
+runs a local OpenSCAD executable with `-D` overrides. Renders run in a
+bounded pool of subprocesses with a timeout. Results are cached on disk,
+keyed by a hash of every file in models/, the entry point, the assignments
+and the renderer configuration. Identical concurrent requests share one
+render.
+
+The executable is pluggable (OPENSCAD_BIN or the `executable` argument), so
+a stub script that writes a fixed STL can stand in for OpenSCAD.
+"""
+import os
+import re
+import json
+import shlex
+import hashlib
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_MODELS_DIR = os.path.normpath(os.path.join(BASE_DIR, "..", "models"))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, "data", "scad_cache")
+
+_NAME_RE = re.compile(r"^[A-Za-z_$][A-Za-z0-9_]*$")
+_BARE_VALUE_RE = re.compile(r"^(true|false|undef|-?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?|\[[-+0-9eE.,\s\[\]]*\])$")
+_STRING_LITERAL_RE = re.compile(r'^"(?:[^"\\\n]|\\.)*"$')
+MAX_LITERAL_LEN = 4096
+
+
+class ScadRenderError(RuntimeError):
+    pass
+
+
+class ScadTimeoutError(ScadRenderError):
+    pass
+
+
+def format_scad_value(value) -> str:
+    # Mirrors formatScadValue() in app.js: strings are passed through as SCAD source
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value) if value == value and abs(value) != float("inf") else "0"
+    return str(value)
+
+
+def customizer_value_to_scad(value: str) -> str:
+    # Customizer parameterSets store every value as a string: keep numbers,
+    # booleans and vectors bare, quote everything else as a SCAD string
+    v = str(value).strip()
+    if _BARE_VALUE_RE.match(v):
+        return v
+    return '"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def scad_literal(value) -> str:
+    """
+    SCAD source for one `-D` value from a request. Only literals pass through
+    bare (booleans, numbers, undef, numeric vectors, quoted strings); any other
+    text becomes a SCAD string as in customizer_value_to_scad, so request
+    values cannot inject expressions. None maps to undef, lists to vectors.
+    """
+    if value is None:
+        literal = "undef"
+    elif isinstance(value, (bool, int, float)):
+        literal = format_scad_value(value)
+    elif isinstance(value, (list, tuple)):
+        literal = "[" + ", ".join(scad_literal(v) for v in value) + "]"
+    elif isinstance(value, str):
+        v = value.strip()
+        literal = v if _STRING_LITERAL_RE.match(v) else customizer_value_to_scad(v)
+    else:
+        raise ValueError(f"unsupported value type: {type(value).__name__}")
+    if len(literal) > MAX_LITERAL_LEN or "\n" in literal:
+        raise ValueError("value too long or spans several lines")
+    return literal
+
+
+def load_parameter_sets(json_path: str) -> Dict[str, Dict[str, str]]:
+    # Some exported files repeat "parameterSets" with empty values; keep the real one
+    def pairs_hook(pairs):
+        out = {}
+        for k, v in pairs:
+            if k == "parameterSets" and not isinstance(v, dict) and isinstance(out.get(k), dict):
+                continue
+            out[k] = v
+        return out
+
+    with open(json_path, "r") as f:
+        data = json.load(f, object_pairs_hook=pairs_hook)
+    sets = data.get("parameterSets")
+    return sets if isinstance(sets, dict) else {}
+
+
+class ScadRenderer:
+    """
+    Render SCAD entry points to binary STL with caching.
+
+    executable: OpenSCAD binary (or a stub with the same CLI).
+    extra_args: additional CLI flags, e.g. ["--backend=manifold"].
+    max_workers: concurrent OpenSCAD processes in this server process.
+    timeout: seconds before a render is killed.
+    max_cache_bytes: size of cache_dir above which the least recently used
+    renders are deleted.
+    """
+
+    def __init__(
+        self,
+        executable: Optional[str] = None,
+        models_dir: str = DEFAULT_MODELS_DIR,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        max_workers: Optional[int] = None,
+        timeout: float = 300.0,
+        extra_args: Optional[List[str]] = None,
+        max_cache_bytes: Optional[int] = None,
+    ):
+        self.executable = executable or os.environ.get("OPENSCAD_BIN", "openscad")
+        self.models_dir = os.path.abspath(models_dir)
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        if max_cache_bytes is None:
+            max_cache_bytes = int(float(os.environ.get("OPENSCAD_CACHE_MAX_MB", "512")) * 1024 * 1024)
+        self.max_cache_bytes = max_cache_bytes
+        if extra_args is None:
+            extra_args = shlex.split(os.environ.get("OPENSCAD_EXTRA_ARGS", ""))
+        self.extra_args = list(extra_args)
+        workers = max_workers or int(os.environ.get("OPENSCAD_WORKERS", "0")) or max(1, (os.cpu_count() or 2) // 2)
+        # Each task blocks on its own OpenSCAD subprocess, so threads are enough
+        # to bound the number of processes running at once
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="openscad")
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._sources: Optional[Tuple[tuple, str]] = None  # (stat signature, digest)
+
+    # ------------ Keys and cache ------------
+
+    def sources_digest(self) -> str:
+        # Hash of every file under models/; re-hashed only when a file changes
+        entries = []
+        for root, _dirs, files in os.walk(self.models_dir):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                st = os.stat(path)
+                entries.append((os.path.relpath(path, self.models_dir), st.st_size, st.st_mtime_ns))
+        sig = tuple(sorted(entries))
+        cached = self._sources
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+        h = hashlib.sha256()
+        for rel, _size, _mtime in sig:
+            h.update(rel.encode("utf-8") + b"\0")
+            with open(os.path.join(self.models_dir, rel), "rb") as f:
+                h.update(hashlib.sha256(f.read()).digest())
+        digest = h.hexdigest()
+        self._sources = (sig, digest)
+        return digest
+
+    def normalize(self, entry: str, assignments: Dict[str, object]) -> Tuple[str, List[Tuple[str, str]]]:
+        entry_path = os.path.abspath(os.path.join(self.models_dir, entry))
+        if not entry_path.startswith(self.models_dir + os.sep):
+            raise ValueError(f"entry must be inside models/: {entry}")
+        if not entry_path.endswith(".scad") or not os.path.isfile(entry_path):
+            raise ValueError(f"unknown SCAD entry point: {entry}")
+        pairs = []
+        for name, value in sorted(assignments.items()):
+            if not _NAME_RE.match(name):
+                raise ValueError(f"invalid variable name: {name!r}")
+            try:
+                literal = scad_literal(value)
+            except ValueError as e:
+                raise ValueError(f"invalid value for {name}: {e}")
+            pairs.append((name, literal))
+        return os.path.relpath(entry_path, self.models_dir), pairs
+
+    def cache_key(self, entry: str, pairs: List[Tuple[str, str]]) -> str:
+        payload = json.dumps(
+            dict(
+                sources=self.sources_digest(),
+                entry=entry,
+                assignments=pairs,
+                executable=os.path.basename(self.executable),
+                extra_args=self.extra_args,
+            ),
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".stl")
+
+    def prune_cache(self):
+        # Delete least recently used renders (mtime, refreshed on hits) until under max_cache_bytes
+        entries = []
+        total = 0
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith(".") or not name.endswith(".stl"):
+                    continue  # in-progress temp files
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_cache_bytes:
+            return
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_cache_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    # ------------ Rendering ------------
+
+    def render(self, entry: str, assignments: Dict[str, object]) -> Tuple[bytes, bool]:
+        """
+        Render `entry` with `assignments` and return (stl_bytes, cache_hit).
+        Raises ValueError for bad input, ScadTimeoutError / ScadRenderError on
+        failure, and RuntimeError when the executable is missing.
+        """
+        return self.submit(entry, assignments).result()
+
+    def submit(self, entry: str, assignments: Dict[str, object]) -> Future:
+        # Future resolving to (stl_bytes, cache_hit); joins an identical in-flight render
+        entry, pairs = self.normalize(entry, assignments)
+        key = self.cache_key(entry, pairs)
+        path = self.cache_path(key)
+        try:
+            with open(path, "rb") as f:
+                stl = f.read()
+            os.utime(path)  # mark as recently used for prune_cache
+        except OSError:
+            pass  # not cached (or evicted meanwhile)
+        else:
+            fut: Future = Future()
+            fut.set_result((stl, True))
+            return fut
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is None:
+                fut = self._pool.submit(self._render_uncached, entry, pairs, path)
+                self._inflight[key] = fut
+                fut.add_done_callback(lambda _f, k=key: self._forget(k))
+        return fut
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _render_uncached(self, entry: str, pairs: List[Tuple[str, str]], path: str) -> Tuple[bytes, bool]:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_out = tempfile.mkstemp(prefix=".render-", suffix=".stl", dir=os.path.dirname(path))
+        os.close(fd)
+        cmd = [self.executable, *self.extra_args, "--export-format", "binstl", "-o", tmp_out]
+        for name, literal in pairs:
+            cmd += ["-D", f"{name}={literal}"]
+        cmd.append(entry)
+        try:
+            try:
+                proc = subprocess.run(cmd, cwd=self.models_dir, capture_output=True, timeout=self.timeout)
+            except FileNotFoundError:
+                raise RuntimeError(
+                    f"OpenSCAD rendering unavailable: '{self.executable}' not found (set OPENSCAD_BIN)."
+                )
+            except subprocess.TimeoutExpired:
+                raise ScadTimeoutError(f"OpenSCAD timed out after {self.timeout:g}s rendering {entry}")
+            if proc.returncode != 0 or os.path.getsize(tmp_out) == 0:
+                tail = proc.stderr.decode("utf-8", "replace").strip().splitlines()[-10:]
+                raise ScadRenderError(f"OpenSCAD failed on {entry} (exit {proc.returncode}):\n" + "\n".join(tail))
+            with open(tmp_out, "rb") as f:
+                stl = f.read()
+            os.replace(tmp_out, path)
+            self.prune_cache()
+            return stl, False
+        finally:
+            if os.path.exists(tmp_out):
+                os.remove(tmp_out)
+
+    # ------------ Presets ------------
+
+    def parameter_set_jobs(self) -> List[Tuple[str, str, Dict[str, str]]]:
+        # (entry, set name, assignments) for each models/<stem>.json beside <stem>.scad
+        jobs = []
+        for name in sorted(os.listdir(self.models_dir)):
+            stem, ext = os.path.splitext(name)
+            entry = stem + ".scad"
+            if ext != ".json" or not os.path.isfile(os.path.join(self.models_dir, entry)):
+                continue
+            for set_name, values in load_parameter_sets(os.path.join(self.models_dir, name)).items():
+                jobs.append((entry, set_name, {k: customizer_value_to_scad(v) for k, v in values.items()}))
+        return jobs
+
+    def parameter_set(self, entry: str, set_name: str) -> Dict[str, str]:
+        for job_entry, job_name, assignments in self.parameter_set_jobs():
+            if job_entry == entry and job_name == set_name:
+                return assignments
+        raise ValueError(f"unknown parameter set {set_name!r} for {entry}")
+
+    def precompute_parameter_sets(self, progress=None) -> List[Tuple[str, str, Optional[Exception]]]:
+        """
+        Render every stored parameterSet so browsers fetch presets from cache.
+        Returns (entry, set name, error or None) per job.
+        """
+        jobs = self.parameter_set_jobs()
+        futures = [(entry, set_name, self.submit(entry, assignments)) for entry, set_name, assignments in jobs]
+        results = []
+        for i, (entry, set_name, fut) in enumerate(futures, start=1):
+            try:
+                fut.result()
+                err = None
+            except Exception as e:  # report and keep going with the other presets
+                err = e
+            results.append((entry, set_name, err))
+            if progress:
+                progress(i, len(futures), entry, set_name, err)
+        return results
+
+
+_default_renderer: Optional[ScadRenderer] = None
+
+
+def get_renderer() -> ScadRenderer:
+    # Process-wide renderer configured from the environment, created on first use
+    global _default_renderer
+    if _default_renderer is None:
+        _default_renderer = ScadRenderer(timeout=float(os.environ.get("OPENSCAD_TIMEOUT", "300")))
+    return _default_renderer
@@ -1,7 +1,9 @@
-from app import create_app
+from app import create_app, preload_shared_assets
 
 # WSGI entrypoint
-# - Gunicorn: use module "wsgi:app"
+# - Gunicorn: use module "wsgi:app" (see gunicorn.conf.py for preloading)
 # - Apache mod_wsgi/Passenger: default variable name is "application"
+# Parse shared assets once here; with preload_app the master does it before fork
+preload_shared_assets()
 app = create_app()
 application = app